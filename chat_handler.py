@@ -1,8 +1,75 @@
 # chat_handler.py
+import asyncio
+import functools
+import json
+import anyio
 from llm_client import LLMClient
-from tools_handler import handle_tool_call, convert_to_openai_tools, fetch_tools, parse_tool_response
+from tools_handler import (
+    commit_to_history,
+    convert_to_openai_tools,
+    execute_tool_call,
+    fetch_tools,
+    handle_tool_calls,
+    has_tool_refs,
+    parse_tool_response,
+    to_message_dict,
+)
 from system_prompt_generator import SystemPromptGenerator
 
+# tool-independent guidelines appended to every system prompt
+_GUIDELINES = """
+
+**GENERAL GUIDELINES:**
+
+1. **Step-by-step reasoning:**
+   - Analyze tasks systematically.
+   - Break down complex problems into smaller, manageable parts.
+   - Verify assumptions at each step to avoid errors.
+   - Reflect on results to improve subsequent actions.
+
+2. **Effective tool usage:**
+   - **Explore:** 
+     - Identify available information and verify its structure.
+     - Check assumptions and understand data relationships.
+   - **Iterate:**
+     - Start with simple queries or actions.
+     - Build upon successes, adjusting based on observations.
+   - **Handle errors:**
+     - Carefully analyze error messages.
+     - Use errors as a guide to refine your approach.
+     - Document what went wrong and suggest fixes.
+
+3. **Clear communication:**
+   - Explain your reasoning and decisions at each step.
+   - Share discoveries transparently with the user.
+   - Outline next steps or ask clarifying questions as needed.
+
+**EXAMPLES OF BEST PRACTICES:**
+
+- **Working with databases:**
+  - Check schema before writing queries.
+  - Verify the existence of columns or tables.
+  - Start with basic queries and refine based on results.
+
+- **Processing data:**
+  - Validate data formats and handle edge cases.
+  - Ensure the integrity and correctness of results.
+
+- **Accessing resources:**
+  - Confirm resource availability and permissions.
+  - Handle missing or incomplete data gracefully.
+
+**REMEMBER:**
+- Be thorough and systematic in your approach.
+- Ensure that each tool call serves a clear and well-explained purpose.
+- When faced with ambiguity, make reasonable assumptions to move forward.
+- Minimize unnecessary user interactions by offering actionable insights and solutions.
+
+**EXAMPLES OF ASSUMPTIONS YOU CAN MAKE:**
+- Use default sorting (e.g., descending order for rankings) unless specified.
+- Assume basic user intentions (e.g., fetching the top 10 items by a common metric like price or popularity).
+"""
+
 async def handle_chat_mode(read_stream, write_stream, provider="openai"):
     """Enter chat mode with multi-call support for autonomous tool chaining."""
     try:
@@ -16,20 +83,26 @@ async def handle_chat_mode(read_stream, write_stream, provider="openai"):
         # generate system prompt
         system_prompt = generate_system_prompt(tools)
 
-        # convert tools to OpenAI format
-        openai_tools = convert_to_openai_tools(tools)
-
         # Initialize the LLM client
         client = LLMClient(provider=provider)
 
+        # convert tools to OpenAI format; the definitions come back in a canonical order,
+        # so the serialized tools are identical on every turn (and hit provider prompt caches)
+        client.tools = convert_to_openai_tools(tools)
+
+        # the system message is built once and sent unchanged at the start of every request,
+        # so providers can reuse their cached prefix; the history only holds the turns
+        client.system_message = {"role": "system", "content": system_prompt}
+
         # setup the conversation history
-        conversation_history = [{"role": "system", "content": system_prompt}]
+        conversation_history = []
 
         # entering chat mode
         print("\nEntering chat mode. Type 'exit' to quit.")
         while True:
             try:
-                user_message = input("\nYou: ").strip()
+                # read input in a worker thread so the event loop keeps running
+                user_message = (await anyio.to_thread.run_sync(input, "\nYou: ")).strip()
                 if user_message.lower() in ["exit", "quit"]:
                     print("Exiting chat mode.")
                     break
@@ -38,7 +111,7 @@ async def handle_chat_mode(read_stream, write_stream, provider="openai"):
                 conversation_history.append({"role": "user", "content": user_message})
 
                 # Process conversation
-                await process_conversation(client, conversation_history, openai_tools, read_stream, write_stream)
+                await process_conversation(client, conversation_history, client.tools, read_stream, write_stream)
 
             except Exception as e:
                 print(f"\nError processing message: {e}")
@@ -48,31 +121,97 @@ async def handle_chat_mode(read_stream, write_stream, provider="openai"):
         print(f"\nError in chat mode: {e}")
 
 
-async def process_conversation(client, conversation_history, openai_tools, read_stream, write_stream):
-    """Process the conversation loop, handling tool calls and responses."""
+async def process_conversation(client, conversation_history, openai_tools, read_stream, write_stream, dynamic_context=None):
+    """
+    Process the conversation loop, handling tool calls and responses.
+
+    dynamic_context holds messages (e.g. retrieved documents) that are only relevant to
+    the current turn; they are sent with each request but never stored in the history.
+    """
+    # the current turn starts with the user message just added
+    turn_start = len(conversation_history) - 1
+
+    # OpenAI always returns structured tool calls, so there's no XML to look for
+    tool_format = "openai" if client.provider == "openai" else "auto"
+
     while True:
+        # tool calls started while the response is still streaming, by index
+        started = {}
+
+        def start_tool_call(index, tool_call):
+            # calls using another call's output have to wait for it
+            if has_tool_refs(tool_call):
+                return
+
+            started[index] = asyncio.create_task(
+                execute_tool_call(tool_call, conversation_history, read_stream, write_stream, format=tool_format)
+            )
+
         # Call the LLM client
-        completion = client.create_completion(
-            messages=conversation_history,
-            tools=openai_tools,
-        )
+        try:
+            completion = await client.acreate_completion(
+                messages=build_request_messages(
+                    client.system_message, conversation_history, dynamic_context, turn_start
+                ),
+                tools=openai_tools,
+                on_tool_call=start_tool_call,
+            )
+        except Exception:
+            # don't leave early tool calls running if the completion failed
+            for task in started.values():
+                task.cancel()
+            raise
 
         response_content = completion.get("response", "No response")
         tool_calls = completion.get("tool_calls", [])
 
         # If tool calls are present, process them
         if tool_calls:
-            # loop through tool calls
-            for tool_call in tool_calls:
-                await handle_tool_call(tool_call, conversation_history, read_stream, write_stream)
+            # run the remaining tool calls alongside any already started
+            await handle_tool_calls(
+                tool_calls, conversation_history, read_stream, write_stream, started, format=tool_format
+            )
 
             # Continue the loop to handle follow-up responses
             continue  
 
         # Otherwise, process as a regular assistant response
         print("Assistant:", response_content)
-        conversation_history.append({"role": "assistant", "content": response_content})
+        commit_to_history(conversation_history, [{"role": "assistant", "content": response_content}])
         break
+
+def build_request_messages(system_message, conversation_history, dynamic_context=None, turn_start=None):
+    """
+    Assemble the messages for an LLM request.
+
+    Requests are laid out as [static system] -> [history] -> [dynamic] -> [recent]:
+    the system message and earlier turns form a stable prefix that providers can cache,
+    dynamic context comes next, and the current turn (from turn_start) comes last.
+
+    Args:
+        system_message (dict): The system message, the same object on every request.
+        conversation_history (list): The append-only conversation history.
+        dynamic_context (list, optional): Messages for this request only.
+        turn_start (int, optional): Index in the history where the current turn starts.
+
+    Returns:
+        list: The messages to send, as plain dicts.
+    """
+    # tool calls and results are kept in the history as dataclasses
+    history = [to_message_dict(message) for message in conversation_history]
+
+    if not dynamic_context:
+        return [system_message, *history]
+
+    if turn_start is None:
+        turn_start = len(history)
+
+    return [
+        system_message,
+        *history[:turn_start],
+        *dynamic_context,
+        *history[turn_start:],
+    ]
         
 def generate_system_prompt(tools):
     """
@@ -84,64 +223,17 @@ def generate_system_prompt(tools):
     Returns:
         str: A short and action-oriented system prompt.
     """
-    prompt_generator = SystemPromptGenerator()
-    tools_json = {"tools": tools}
-
-    # Generate base prompt for tools
-    system_prompt = prompt_generator.generate_prompt(tools_json)
+    # the tools part is cached, keyed on the serialized tools
+    tools_key = json.dumps(tools, sort_keys=True)
 
     # Add concise, tool-focused guidelines
-    system_prompt += """
-
-**GENERAL GUIDELINES:**
-
-1. **Step-by-step reasoning:**
-   - Analyze tasks systematically.
-   - Break down complex problems into smaller, manageable parts.
-   - Verify assumptions at each step to avoid errors.
-   - Reflect on results to improve subsequent actions.
-
-2. **Effective tool usage:**
-   - **Explore:** 
-     - Identify available information and verify its structure.
-     - Check assumptions and understand data relationships.
-   - **Iterate:**
-     - Start with simple queries or actions.
-     - Build upon successes, adjusting based on observations.
-   - **Handle errors:**
-     - Carefully analyze error messages.
-     - Use errors as a guide to refine your approach.
-     - Document what went wrong and suggest fixes.
+    return _cached_tool_prompt(tools_key) + _GUIDELINES
 
-3. **Clear communication:**
-   - Explain your reasoning and decisions at each step.
-   - Share discoveries transparently with the user.
-   - Outline next steps or ask clarifying questions as needed.
-
-**EXAMPLES OF BEST PRACTICES:**
-
-- **Working with databases:**
-  - Check schema before writing queries.
-  - Verify the existence of columns or tables.
-  - Start with basic queries and refine based on results.
-
-- **Processing data:**
-  - Validate data formats and handle edge cases.
-  - Ensure the integrity and correctness of results.
-
-- **Accessing resources:**
-  - Confirm resource availability and permissions.
-  - Handle missing or incomplete data gracefully.
-
-**REMEMBER:**
-- Be thorough and systematic in your approach.
-- Ensure that each tool call serves a clear and well-explained purpose.
-- When faced with ambiguity, make reasonable assumptions to move forward.
-- Minimize unnecessary user interactions by offering actionable insights and solutions.
-
-**EXAMPLES OF ASSUMPTIONS YOU CAN MAKE:**
-- Use default sorting (e.g., descending order for rankings) unless specified.
-- Assume basic user intentions (e.g., fetching the top 10 items by a common metric like price or popularity).
-"""
-    return system_prompt
+@functools.lru_cache(maxsize=8)
+def _cached_tool_prompt(tools_key):
+    """Generate the tools part of the system prompt from the serialized tools."""
+    prompt_generator = SystemPromptGenerator()
+    tools_json = {"tools": json.loads(tools_key)}
 
+    # Generate base prompt for tools
+    return prompt_generator.generate_prompt(tools_json)
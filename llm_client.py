@@ -1,16 +1,21 @@
 import os
 import uuid
-import ollama
-from openai import OpenAI
-from dotenv import load_dotenv
 import logging
-from typing import Dict, Any, List
+import orjson
+from typing import Callable, Dict, Any, List, Optional
 
-# Load environment variables
-load_dotenv()
+def _load_env() -> None:
+    """Load environment variables from .env, once per process."""
+    if not os.environ.get("_DOTENV_LOADED"):
+        from dotenv import load_dotenv
+        load_dotenv()
+        os.environ["_DOTENV_LOADED"] = "1"
 
 class LLMClient:
     def __init__(self, provider="openai", model="gpt-4o-mini", api_key=None):
+        # Load environment variables
+        _load_env()
+
         # set the provider, model and api key
         self.provider = provider
         self.model = model
@@ -20,9 +25,26 @@ class LLMClient:
         if provider == "openai" and not self.api_key:
             raise ValueError("The OPENAI_API_KEY environment variable is not set.")
         
-        # check ollama is good
-        if provider == "ollama" and not hasattr(ollama, "chat"):
-            raise ValueError("Ollama is not properly configured in this environment.")
+        # create the provider clients once, so their connection pools are reused across calls;
+        # providers are only imported here, keeping them off the startup path of other commands
+        if provider == "openai":
+            from openai import AsyncOpenAI, OpenAI
+            self._openai = OpenAI(api_key=self.api_key)
+            self._async_openai = AsyncOpenAI(api_key=self.api_key)
+        elif provider == "ollama":
+            import ollama
+
+            # check ollama is good
+            if not hasattr(ollama, "chat"):
+                raise ValueError("Ollama is not properly configured in this environment.")
+
+            self._ollama = ollama.Client()
+            self._async_ollama = ollama.AsyncClient()
+
+        # the system message and tools sent with every request; kept as the same objects
+        # across turns so the start of each request is identical
+        self.system_message = None
+        self.tools = ()
 
     def create_completion(self, messages: List[Dict], tools: List = None) -> Dict[str, Any]:
         """Create a chat completion using the specified LLM provider."""
@@ -36,70 +58,195 @@ class LLMClient:
             # unsupported providers
             raise ValueError(f"Unsupported provider: {self.provider}")
 
+    async def acreate_completion(
+        self,
+        messages: List[Dict],
+        tools: List = None,
+        on_tool_call: Optional[Callable[[int, Dict], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Create a chat completion without blocking the event loop.
+
+        If the provider streams its response, on_tool_call is called with the index and
+        tool call as soon as each tool call's arguments are complete, before the rest of
+        the response has been generated.
+        """
+        if self.provider == "openai":
+            # perform a streaming openai completion
+            return await self._openai_completion_async(messages, tools, on_tool_call)
+        elif self.provider == "ollama":
+            # perform an async ollama completion
+            return await self._ollama_completion_async(messages, tools)
+        else:
+            # unsupported providers
+            raise ValueError(f"Unsupported provider: {self.provider}")
+
     def _openai_completion(self, messages: List[Dict], tools: List) -> Dict[str, Any]:
         """Handle OpenAI chat completions."""
-        # get the openai client
-        client = OpenAI(api_key=self.api_key)
-
         try:
             # make a request, passing in tools
-            response = client.chat.completions.create(
+            response = self._openai.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 tools=tools or [],
             )
 
+            # return the response
+            return self._openai_result(response)
+        except Exception as e:
+            # error
+            logging.error(f"OpenAI API Error: {str(e)}")
+            raise ValueError(f"OpenAI API Error: {str(e)}")
+
+    async def _openai_completion_async(
+        self,
+        messages: List[Dict],
+        tools: List,
+        on_tool_call: Optional[Callable[[int, Dict], None]] = None,
+    ) -> Dict[str, Any]:
+        """Handle OpenAI chat completions, streaming the response."""
+        content = []
+        tool_calls = {}
+        completed = set()
+
+        try:
+            # make a streaming request, passing in tools
+            stream = await self._async_openai.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                tools=tools or [],
+                stream=True,
+            )
+
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+
+                # accumulate the response text
+                if delta.content:
+                    content.append(delta.content)
+
+                # accumulate the tool calls, which arrive in fragments
+                for fragment in delta.tool_calls or []:
+                    tool_call = tool_calls.setdefault(fragment.index, {
+                        "id": None,
+                        "type": "function",
+                        "function": {"name": "", "arguments": ""},
+                    })
+                    if fragment.id:
+                        tool_call["id"] = fragment.id
+                    if fragment.function:
+                        tool_call["function"]["name"] += fragment.function.name or ""
+                        tool_call["function"]["arguments"] += fragment.function.arguments or ""
+
+                    # hand over the tool call as soon as its arguments are complete
+                    if (
+                        on_tool_call
+                        and fragment.index not in completed
+                        and _is_complete_json(tool_call["function"]["arguments"])
+                    ):
+                        completed.add(fragment.index)
+                        on_tool_call(fragment.index, tool_call)
+
             # return the response
             return {
-                "response": response.choices[0].message.content,
-                "tool_calls": getattr(response.choices[0].message, "tool_calls", []),
+                "response": "".join(content) or None,
+                "tool_calls": [tool_calls[index] for index in sorted(tool_calls)],
             }
         except Exception as e:
             # error
             logging.error(f"OpenAI API Error: {str(e)}")
             raise ValueError(f"OpenAI API Error: {str(e)}")
 
+    @staticmethod
+    def _openai_result(response) -> Dict[str, Any]:
+        """Extract the response text and tool calls from an OpenAI completion."""
+        return {
+            "response": response.choices[0].message.content,
+            "tool_calls": getattr(response.choices[0].message, "tool_calls", []),
+        }
+
     def _ollama_completion(self, messages: List[Dict], tools: List) -> Dict[str, Any]:
         """Handle Ollama chat completions."""
-        # Format messages for Ollama
-        ollama_messages = [
-            {"role": msg["role"], "content": msg["content"]} 
-            for msg in messages
-        ]
-
         try:
             # Make API call with tools
-            response = ollama.chat(
+            response = self._ollama.chat(
                 model="qwen2.5-coder",
-                messages=ollama_messages,
+                messages=self._ollama_messages(messages),
                 stream=False,
                 tools=tools or []
             )
 
-            logging.info(f"Ollama raw response: {response}")
+            # return the response
+            return self._ollama_result(response)
 
-            # Extract the message and tool calls
-            message = response.message
-            tool_calls = []
+        except Exception as e:
+            # error
+            logging.error(f"Ollama API Error: {str(e)}")
+            raise ValueError(f"Ollama API Error: {str(e)}")
 
-            # Convert Ollama tool calls to OpenAI format
-            if hasattr(message, 'tool_calls') and message.tool_calls:
-                for tool in message.tool_calls:
-                    tool_calls.append({
-                        "id": str(uuid.uuid4()),  # Generate unique ID
-                        "type": "function",
-                        "function": {
-                            "name": tool.function.name,
-                            "arguments": tool.function.arguments
-                        }
-                    })
+    async def _ollama_completion_async(self, messages: List[Dict], tools: List) -> Dict[str, Any]:
+        """Handle Ollama chat completions without blocking the event loop."""
+        try:
+            # Make API call with tools
+            response = await self._async_ollama.chat(
+                model="qwen2.5-coder",
+                messages=self._ollama_messages(messages),
+                stream=False,
+                tools=tools or []
+            )
 
-            return {
-                "response": message.content if message else "No response",
-                "tool_calls": tool_calls
-            }
+            # return the response
+            return self._ollama_result(response)
 
         except Exception as e:
             # error
             logging.error(f"Ollama API Error: {str(e)}")
-            raise ValueError(f"Ollama API Error: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Ollama API Error: {str(e)}")
+
+    @staticmethod
+    def _ollama_messages(messages: List[Dict]) -> List[Dict]:
+        """Format messages for Ollama."""
+        return [
+            {"role": msg["role"], "content": msg["content"]} 
+            for msg in messages
+        ]
+
+    @staticmethod
+    def _ollama_result(response) -> Dict[str, Any]:
+        """Extract the response text and tool calls from an Ollama completion."""
+        logging.info(f"Ollama raw response: {response}")
+
+        # Extract the message and tool calls
+        message = response.message
+        tool_calls = []
+
+        # Convert Ollama tool calls to OpenAI format
+        if hasattr(message, 'tool_calls') and message.tool_calls:
+            for tool in message.tool_calls:
+                tool_calls.append({
+                    "id": str(uuid.uuid4()),  # Generate unique ID
+                    "type": "function",
+                    "function": {
+                        "name": tool.function.name,
+                        "arguments": tool.function.arguments
+                    }
+                })
+
+        return {
+            "response": message.content if message else "No response",
+            "tool_calls": tool_calls
+        }
+
+def _is_complete_json(text: str) -> bool:
+    """Check whether streamed tool call arguments form a complete JSON object."""
+    # cheap check first, so we only parse once the closing brace has arrived
+    if not text.rstrip().endswith("}"):
+        return False
+
+    try:
+        orjson.loads(text)
+        return True
+    except orjson.JSONDecodeError:
+        return False
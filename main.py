@@ -1,9 +1,11 @@
 import argparse
+import json
 import logging
 import sys
 import anyio
 import asyncio
 import os
+from typing import Awaitable, Callable, Dict
 from config import load_config
 from messages.tools import send_call_tool, send_tools_list
 from messages.resources import send_resources_list
@@ -23,87 +25,125 @@ logging.basicConfig(
     stream=sys.stderr
 )
 
+# Command to clear the screen on this platform
+CLEAR_COMMAND = "cls" if sys.platform == "win32" else "clear"
+
+async def _do_ping(read_stream, write_stream) -> bool:
+    """Ping the server."""
+    print("\nPinging Server...")
+    result = await send_ping(read_stream, write_stream)
+    print("Server is up and running" if result else "Server ping failed")
+    return True
+
+async def _do_list_tools(read_stream, write_stream) -> bool:
+    """List the server's tools."""
+    print("\nFetching Tools List...")
+    tools = await send_tools_list(read_stream, write_stream)
+    print("Tools List:", tools)
+    return True
+
+async def _do_call_tool(read_stream, write_stream) -> bool:
+    """Prompt for a tool and its arguments, then call it."""
+    tool_name = (await anyio.to_thread.run_sync(input, "Enter tool name: ")).strip()
+    if not tool_name:
+        print("Tool name cannot be empty.")
+        return True
+
+    arguments_str = (await anyio.to_thread.run_sync(
+        input, 'Enter tool arguments as JSON (e.g., {"key": "value"}): '
+    )).strip()
+    try:
+        # no arguments needs no parsing
+        arguments = json.loads(arguments_str) if arguments_str else {}
+    except json.JSONDecodeError as e:
+        print(f"Invalid arguments format: {e}")
+        return True
+
+    print(f"\nCalling tool '{tool_name}' with arguments: {arguments}")
+    result = await send_call_tool(tool_name, arguments, read_stream, write_stream)
+    if result.get("isError"):
+        print(f"Error calling tool: {result.get('error')}")
+    else:
+        print("Tool Response:", result.get("content"))
+    return True
+
+async def _do_list_resources(read_stream, write_stream) -> bool:
+    """List the server's resources."""
+    print("\nFetching Resources List...")
+    resources = await send_resources_list(read_stream, write_stream)
+    print("Resources List:", resources)
+    return True
+
+async def _do_list_prompts(read_stream, write_stream) -> bool:
+    """List the server's prompts."""
+    print("\nFetching Prompts List...")
+    prompts = await send_prompts_list(read_stream, write_stream)
+    print("Prompts List:", prompts)
+    return True
+
+async def _do_chat(read_stream, write_stream) -> bool:
+    """Enter chat mode."""
+    # Retrieve provider and model from environment variables
+    provider = os.getenv("LLM_PROVIDER", "openai")
+    model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+    # Announce provider and model in use
+    print(f"\nEntering chat mode using provider '{provider}' and model '{model}'...")
+
+    # handle chat mode
+    await handle_chat_mode(read_stream, write_stream, provider)
+    return True
+
+async def _do_quit(read_stream, write_stream) -> bool:
+    """Exit the program."""
+    print("\nGoodbye!")
+    return False
+
+async def _do_clear(read_stream, write_stream) -> bool:
+    """Clear the screen."""
+    os.system(CLEAR_COMMAND)
+    return True
+
+async def _do_help(read_stream, write_stream) -> bool:
+    """Show the available commands."""
+    print("\nAvailable commands:")
+    print("  ping          - Check if server is responsive")
+    print("  list-tools    - Display available tools")
+    print("  list-resources- Display available resources")
+    print("  list-prompts  - Display available prompts")
+    print("  chat          - Enter chat mode")
+    print("  clear         - Clear the screen")
+    print("  help          - Show this help message")
+    print("  quit/exit     - Exit the program")
+    return True
+
+# Command handlers; each returns False when the program should exit
+COMMANDS: Dict[str, Callable[..., Awaitable[bool]]] = {
+    "ping": _do_ping,
+    "list-tools": _do_list_tools,
+    "call-tool": _do_call_tool,
+    "list-resources": _do_list_resources,
+    "list-prompts": _do_list_prompts,
+    "chat": _do_chat,
+    "quit": _do_quit,
+    "exit": _do_quit,
+    "clear": _do_clear,
+    "help": _do_help,
+}
+
 async def handle_command(command: str, read_stream, write_stream):
     """Handle specific commands dynamically."""
+    handler = COMMANDS.get(command)
+    if handler is None:
+        print(f"\nUnknown command: {command}")
+        print("Type 'help' for available commands")
+        return True
+
     try:
-        if command == "ping":
-            # ping server
-            print("\nPinging Server...")
-            result = await send_ping(read_stream, write_stream)
-            print("Server is up and running" if result else "Server ping failed")
-        elif command == "list-tools":
-            # list tools
-            print("\nFetching Tools List...")
-            tools = await send_tools_list(read_stream, write_stream)
-            print("Tools List:", tools)
-        elif command == "call-tool":
-            # call tool
-            tool_name = input("Enter tool name: ").strip()
-            if not tool_name:
-                print("Tool name cannot be empty.")
-                return True
-
-            arguments_str = input("Enter tool arguments as JSON (e.g., {'key': 'value'}): ").strip()
-            try:
-                arguments = eval(arguments_str)  # Convert string to dict
-            except Exception as e:
-                print(f"Invalid arguments format: {e}")
-                return True
-
-            print(f"\nCalling tool '{tool_name}' with arguments: {arguments}")
-            result = await send_call_tool(tool_name, arguments, read_stream, write_stream)
-            if result.get("isError"):
-                print(f"Error calling tool: {result.get('error')}")
-            else:
-                print("Tool Response:", result.get("content"))
-        elif command == "list-resources":
-            # list resources
-            print("\nFetching Resources List...")
-            resources = await send_resources_list(read_stream, write_stream)
-            print("Resources List:", resources)
-        elif command == "list-prompts":
-            # list prompts
-            print("\nFetching Prompts List...")
-            prompts = await send_prompts_list(read_stream, write_stream)
-            print("Prompts List:", prompts)
-        elif command == "chat":
-            # Retrieve provider and model from environment variables
-            provider = os.getenv("LLM_PROVIDER", "openai")
-            model = os.getenv("LLM_MODEL", "gpt-4o-mini")
-    
-            # Announce provider and model in use
-            print(f"\nEntering chat mode using provider '{provider}' and model '{model}'...")
-
-            # handle chat mode
-            await handle_chat_mode(read_stream, write_stream, provider)
-        elif command in ["quit", "exit"]:
-            # exit
-            print("\nGoodbye!")
-            return False
-        elif command == "clear":
-            if sys.platform == "win32":
-                # clear
-                os.system("cls")
-            else:
-                # clear
-                os.system("clear")
-        elif command == "help":
-            # help commands
-            print("\nAvailable commands:")
-            print("  ping          - Check if server is responsive")
-            print("  list-tools    - Display available tools")
-            print("  list-resources- Display available resources")
-            print("  list-prompts  - Display available prompts")
-            print("  chat          - Enter chat mode")
-            print("  clear         - Clear the screen")
-            print("  help          - Show this help message")
-            print("  quit/exit     - Exit the program")
-        else:
-            print(f"\nUnknown command: {command}")
-            print("Type 'help' for available commands")
+        return await handler(read_stream, write_stream)
     except Exception as e:
         print(f"\nError executing command: {e}")
-    
+
     return True
 
 
@@ -225,9 +265,23 @@ if __name__ == "__main__":
     os.environ["LLM_PROVIDER"] = args.provider
     os.environ["LLM_MODEL"] = model
 
+    # Use uvloop for the event loop when it's installed (it isn't available on Windows)
+    try:
+        import uvloop  # noqa: F401
+        backend_options = {"use_uvloop": True}
+    except ImportError:
+        backend_options = {}
+
     try:
         # Run the main function
-        anyio.run(main, args.config_file, args.server, args.command)
+        anyio.run(
+            main,
+            args.config_file,
+            args.server,
+            args.command,
+            backend="asyncio",
+            backend_options=backend_options,
+        )
     except KeyboardInterrupt:
         # Exit on keyboard interrupt
         os._exit(0)
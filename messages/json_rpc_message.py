@@ -1,4 +1,5 @@
 # messages/json_rpc_message.py
+import orjson
 from pydantic import BaseModel, Field
 from typing import Any, Dict, Optional
 
@@ -10,5 +11,9 @@ class JSONRPCMessage(BaseModel):
     result: Optional[Dict[str, Any]] = None
     error: Optional[Dict[str, Any]] = None
 
-    class Config:
-        extra = "allow"
\ No newline at end of file
+    # messages are never modified once built; build the schema on first use, not at import
+    model_config = {"extra": "allow", "frozen": True, "defer_build": True}
+
+    def model_dump_bytes(self, **kwargs) -> bytes:
+        """Serialize the message to JSON bytes using orjson."""
+        return orjson.dumps(self.model_dump(**kwargs))
@@ -13,7 +13,6 @@ async def send_ping(
         read_stream=read_stream,
         write_stream=write_stream,
         method="ping",
-        message_id="ping-1",
     )
 
     # return the response
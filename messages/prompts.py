@@ -1,17 +1,17 @@
 # messages/prompts.py
 from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
-from messages.send_message import send_message
+from messages.send_message import cached_rpc
 
 async def send_prompts_list(
     read_stream: MemoryObjectReceiveStream,
     write_stream: MemoryObjectSendStream,
 ) -> list:
     """Send a 'prompts/list' message and return the list of prompts."""
-    response = await send_message(
+    response = await cached_rpc(
         read_stream=read_stream,
         write_stream=write_stream,
         method="prompts/list",
     )
 
     # return the result
-    return response.get("result", [])
+    return response.result or []
@@ -2,35 +2,48 @@
 import logging
 import anyio
 from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from messages.json_rpc_message import JSONRPCMessage
 
 # Models for JSON-RPC Communication
+# (schemas are built on first use rather than at import)
 class MCPClientCapabilities(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     roots: dict = Field(default_factory=lambda: {"listChanged": True})
     sampling: dict = Field(default_factory=dict)
 
 class MCPClientInfo(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     name: str = "PythonMCPClient"
     version: str = "1.0.0"
 
 class InitializeParams(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     protocolVersion: str
     capabilities: MCPClientCapabilities
     clientInfo: MCPClientInfo
 
 class ServerInfo(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     name: str
     version: str
 
 class ServerCapabilities(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     logging: dict = Field(default_factory=dict)
     prompts: Optional[dict] = None
     resources: Optional[dict] = None
     tools: Optional[dict] = None
 
 class InitializeResult(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     protocolVersion: str
     capabilities: ServerCapabilities
     serverInfo: ServerInfo
@@ -71,7 +84,8 @@ async def send_initialize(
                     continue
 
                 # debug log the received message
-                logging.debug(f"Received: {response.model_dump()}")
+                if logging.getLogger().isEnabledFor(logging.DEBUG):
+                    logging.debug(f"Received: {response.model_dump()}")
 
                 # error
                 if response.error:
@@ -82,7 +96,8 @@ async def send_initialize(
                 # we have a result
                 if response.result:
                     try:
-                        # validate the result
+                        # validate the result; this is the one response per connection that is
+                        # validated, everything afterwards is built with model_construct
                         init_result = InitializeResult.model_validate(response.result)
                         logging.debug("Server initialized successfully")
 
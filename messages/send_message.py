@@ -1,9 +1,76 @@
 # messages/send_message.py
+import asyncio
 import logging
+import random
+import time
+import uuid
 import anyio
 from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 from messages.json_rpc_message import JSONRPCMessage
 
+# requests awaiting a response, keyed by message id
+_pending: dict[str, asyncio.Future] = {}
+
+# the background task reading responses, and the stream it reads from
+_reader_task: asyncio.Task = None
+_reader_stream: MemoryObjectReceiveStream = None
+
+# serialize writes to the shared stream
+_write_lock = asyncio.Lock()
+
+# responses to idempotent methods, keyed by method, with the time they expire
+_rpc_cache: dict[str, tuple[float, JSONRPCMessage]] = {}
+
+
+def invalidate(method: str = None) -> None:
+    """Drop the cached response for a method, or every cached response if no method is given."""
+    if method is None:
+        _rpc_cache.clear()
+    else:
+        _rpc_cache.pop(method, None)
+
+
+async def _read_responses(read_stream: MemoryObjectReceiveStream) -> None:
+    """Read messages from the server and hand each one to the request with the matching id."""
+    try:
+        async for response in read_stream:
+            if isinstance(response, Exception):
+                logging.error(f"Server error: {response}")
+                continue
+
+            # a list changed on the server, e.g. notifications/tools/list_changed
+            if response.method and response.method.endswith("/list_changed"):
+                invalidate(response.method.removeprefix("notifications/").removesuffix("_changed"))
+                continue
+
+            # dispatch to the waiting request
+            future = _pending.pop(response.id, None)
+            if future is not None and not future.done():
+                future.set_result(response)
+            else:
+                logging.debug(f"Discarding unexpected message: {response}")
+    except anyio.ClosedResourceError:
+        logging.debug("Read stream closed.")
+    finally:
+        # nothing else will arrive, so fail anything still waiting
+        for future in _pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Read stream closed before a response was received"))
+        _pending.clear()
+
+
+def _ensure_reader(read_stream: MemoryObjectReceiveStream) -> None:
+    """Start the background reader for the stream if it isn't already running."""
+    global _reader_task, _reader_stream
+
+    if _reader_task is None or _reader_task.done() or _reader_stream is not read_stream:
+        # cached responses belong to the previous connection
+        if _reader_stream is not read_stream:
+            invalidate()
+
+        _reader_stream = read_stream
+        _reader_task = asyncio.create_task(_read_responses(read_stream))
+
 
 async def send_message(
     read_stream: MemoryObjectReceiveStream,
@@ -13,54 +80,107 @@ async def send_message(
     timeout: float = 5,
     message_id: str = None,
     retries: int = 3,
-) -> dict:
+) -> JSONRPCMessage:
     """
     Send a JSON-RPC message to the server and return the response.
 
+    Responses are read by a single background task and matched to requests by id,
+    so several messages may be in flight at once.
+
     Args:
         read_stream (MemoryObjectReceiveStream): The stream to read responses.
         write_stream (MemoryObjectSendStream): The stream to send requests.
         method (str): The method name for the JSON-RPC message.
         params (dict, optional): Parameters for the method. Defaults to None.
         timeout (float, optional): Timeout in seconds to wait for a response. Defaults to 5.
-        message_id (str, optional): Unique ID for the message. Defaults to the method name.
+        message_id (str, optional): Unique ID for the message. Defaults to a random UUID.
         retries (int, optional): Number of retry attempts. Defaults to 3.
 
     Returns:
-        dict: The server's response as a dictionary.
+        JSONRPCMessage: The server's response.
 
     Raises:
         TimeoutError: If no response is received within the timeout after retries.
-        Exception: If an unexpected error occurs after retries.
+        ConnectionError: If the read stream closes on every attempt.
+        Exception: If an unexpected error occurs; these are not retried.
     """
-    message = JSONRPCMessage(id=message_id or method, method=method, params=params)
+    message_id = message_id or uuid.uuid4().hex
+    message = JSONRPCMessage(id=message_id, method=method, params=params)
 
     for attempt in range(1, retries + 1):
         try:
+            # make sure something is reading responses
+            _ensure_reader(read_stream)
+
+            # register for the response before sending, so it can't be missed
+            future = asyncio.get_running_loop().create_future()
+            _pending[message_id] = future
+
             # Send the message
             logging.debug(f"Attempt {attempt}/{retries}: Sending message: {message}")
-            await write_stream.send(message)
+            async with _write_lock:
+                await write_stream.send(message)
 
             # Wait for a response with a timeout
-            with anyio.fail_after(timeout):
-                async for response in read_stream:
-                    if not isinstance(response, Exception):
-                        logging.debug(f"Received response: {response.model_dump()}")
-                        return response.model_dump()
-                    else:
-                        logging.error(f"Server error: {response}")
-                        raise response
-
-        except TimeoutError:
-            # timeout
-            logging.error(f"Timeout waiting for response to method '{method}' (Attempt {attempt}/{retries})")
+            response = await asyncio.wait_for(future, timeout)
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(f"Received response: {response.model_dump()}")
+            return response
+
+        except (TimeoutError, ConnectionError) as e:
+            # transient failure
+            if isinstance(e, TimeoutError):
+                logging.error(f"Timeout waiting for response to method '{method}' (Attempt {attempt}/{retries})")
+            else:
+                logging.error(f"Connection error during '{method}' request: {e} (Attempt {attempt}/{retries})")
             if attempt == retries:
                 raise
+
+            # exponential backoff with jitter before retrying
+            await anyio.sleep(min(0.1 * 2 ** (attempt - 1), 1.0) + random.random() * 0.05)
         except Exception as e:
-            # exception
-            logging.error(f"Unexpected error during '{method}' request: {e} (Attempt {attempt}/{retries})")
-            if attempt == retries:
-                raise
-        
-        # Delay before retrying
-        await anyio.sleep(2)  
+            # other errors won't go away by retrying
+            logging.error(f"Unexpected error during '{method}' request: {e}")
+            raise
+        finally:
+            # no longer waiting for this response
+            _pending.pop(message_id, None)
+
+
+async def cached_rpc(
+    read_stream: MemoryObjectReceiveStream,
+    write_stream: MemoryObjectSendStream,
+    method: str,
+    ttl: float = 30,
+) -> JSONRPCMessage:
+    """
+    Send a JSON-RPC message for an idempotent method, reusing a recent response.
+
+    Cached responses are dropped after ttl seconds, or as soon as the server sends
+    the matching list_changed notification.
+
+    Args:
+        read_stream (MemoryObjectReceiveStream): The stream to read responses.
+        write_stream (MemoryObjectSendStream): The stream to send requests.
+        method (str): The method name for the JSON-RPC message.
+        ttl (float, optional): Seconds to reuse the response for. Defaults to 30.
+
+    Returns:
+        JSONRPCMessage: The server's response.
+    """
+    # reuse the cached response if it hasn't expired
+    cached = _rpc_cache.get(method)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    response = await send_message(
+        read_stream=read_stream,
+        write_stream=write_stream,
+        method=method,
+    )
+
+    # only cache successful responses
+    if not response.error:
+        _rpc_cache[method] = (time.monotonic() + ttl, response)
+
+    return response
@@ -1,18 +1,20 @@
 # messages/tools.py
+import orjson
+from typing import Union
 from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
-from messages.send_message import send_message
+from messages.send_message import cached_rpc, send_message
 
 async def send_tools_list(
     read_stream: MemoryObjectReceiveStream,
     write_stream: MemoryObjectSendStream,
 ) -> list:
     """Send a 'tools/list' message and return the list of tools."""
-    response = await send_message(
+    response = await cached_rpc(
         read_stream=read_stream,
         write_stream=write_stream,
         method="tools/list",
     )
-    return response.get("result", [])
+    return response.result or []
 
 
 async def send_call_tool(
@@ -22,6 +24,24 @@ async def send_call_tool(
     write_stream: MemoryObjectSendStream,
 ) -> dict:
     """Send a 'tools/call' request and return the tool's response."""
+    return await _send_call_tool_raw(tool_name, arguments, read_stream, write_stream)
+
+
+async def _send_call_tool_raw(
+    tool_name: str,
+    arguments: Union[str, dict],
+    read_stream: MemoryObjectReceiveStream,
+    write_stream: MemoryObjectSendStream,
+) -> dict:
+    """
+    Send a 'tools/call' request and return the tool's response.
+
+    Arguments given as a JSON string are embedded in the request as-is,
+    rather than being decoded and encoded again.
+    """
+    if isinstance(arguments, str):
+        arguments = orjson.Fragment(arguments)
+
     try:
         response = await send_message(
             read_stream=read_stream,
@@ -29,6 +49,10 @@ async def send_call_tool(
             method="tools/call",
             params={"name": tool_name, "arguments": arguments},
         )
-        return response.get("result", {})
+
+        # a JSON-RPC error response has no result
+        if response.error:
+            return {"isError": True, "error": response.error}
+        return response.result or {}
     except Exception as e:
         return {"isError": True, "error": str(e)}
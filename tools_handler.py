@@ -1,98 +1,402 @@
-import json
+import asyncio
+import functools
+import itertools
 import logging
 import re
-from typing import Optional, Dict, Any
-from messages.tools import send_call_tool, send_tools_list
+import time
+import orjson
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Literal
+from messages.tools import _send_call_tool_raw, send_tools_list
+
+# a tool call in Llama's XML-style format; DOTALL so multi-line arguments match
+_FUNCTION_RE = re.compile(r"<function=(\w+)>(.*?)</function>", re.DOTALL)
+
+# marks an argument that takes the output of another tool call in the same turn
+_TOOL_REF_RE = re.compile(r"\$ref:([\w-]+)")
+
+# formatted responses of cacheable tools with the time they expire, keyed by
+# (tool name, canonical arguments), least recently used first
+_TOOL_CACHE: OrderedDict[tuple[str, bytes], tuple[float, str]] = OrderedDict()
+_TOOL_CACHE_SIZE = 256
+_TOOL_CACHE_TTL = 30
+
+# numbers tool call ids, so each call in the history gets a unique id
+_CALL_COUNTER = itertools.count()
+
+# tools whose schema marks them as cacheable, i.e. free of side effects and stable
+_CACHEABLE_TOOLS: set[str] = set()
+
+@dataclass(slots=True)
+class AssistantToolCallMsg:
+    """The assistant message requesting a tool call, as kept in the conversation history."""
+    role: str
+    content: None
+    tool_calls: list
+
+@dataclass(slots=True)
+class ToolResultMsg:
+    """A tool's response, as kept in the conversation history."""
+    role: str
+    name: str
+    content: str
+    tool_call_id: str
+
+def to_message_dict(message) -> dict:
+    """Get a conversation history message as the plain dict LLM clients expect."""
+    if type(message) is dict:
+        return message
+
+    # a shallow copy; asdict would also deep-copy the tool calls on every request
+    return {name: getattr(message, name) for name in type(message).__slots__}
+
+def _dumps(obj) -> str:
+    """Serialize an object to a JSON string using orjson."""
+    return orjson.dumps(obj).decode()
 
 def parse_tool_response(response: str) -> Optional[Dict[str, Any]]:
     """Parse tool call from Llama's XML-style format."""
-    function_regex = r"<function=(\w+)>(.*?)</function>"
-    match = re.search(function_regex, response)
-    
-    if match:
+    start = response.find("<function=")
+    if start < 0:
+        return None
+
+    # fast path: slice between the literal tags
+    function_name = None
+    name_start = start + len("<function=")
+    name_end = response.find(">", name_start)
+    if name_end >= 0:
+        args_end = response.find("</function>", name_end + 1)
+        if args_end >= 0 and response[name_start:name_end].isidentifier():
+            function_name = response[name_start:name_end]
+            args_string = response[name_end + 1:args_end]
+
+    # fall back to the regex for anything the fast path couldn't validate
+    if function_name is None:
+        match = _FUNCTION_RE.search(response)
+        if not match:
+            return None
         function_name, args_string = match.groups()
-        try:
-            args = json.loads(args_string)
-            return {
-                "function": function_name,
-                "arguments": args,
-            }
-        except json.JSONDecodeError as error:
-            logging.debug(f"Error parsing function arguments: {error}")
+
+    try:
+        args = orjson.loads(args_string)
+        return {
+            "function": function_name,
+            "arguments": args,
+        }
+    except orjson.JSONDecodeError as error:
+        logging.debug(f"Error parsing function arguments: {error}")
     return None
 
-async def handle_tool_call(tool_call, conversation_history, read_stream, write_stream):
+async def handle_tool_call(
+    tool_call,
+    conversation_history,
+    read_stream,
+    write_stream,
+    format: Literal["openai", "llama", "auto"] = "auto",
+):
     """Handle a single tool call for both OpenAI and Llama formats."""
+    await handle_tool_calls([tool_call], conversation_history, read_stream, write_stream, format=format)
+
+async def handle_tool_calls(
+    tool_calls,
+    conversation_history,
+    read_stream,
+    write_stream,
+    started=None,
+    format: Literal["openai", "llama", "auto"] = "auto",
+):
+    """
+    Handle a turn's tool calls concurrently, then add their results to the history.
+
+    The results are appended in the order the tools were requested, whatever order
+    they finish in, so the history stays deterministic.
+    """
+    results = await run_tool_calls(
+        tool_calls, conversation_history, read_stream, write_stream, started, format=format
+    )
+    commit_to_history(conversation_history, itertools.chain.from_iterable(results))
+
+def _cache_tool_response(cache_key, formatted_response):
+    """
+    Remember a cacheable tool's response so identical calls can skip the server.
+
+    Only tools whose schema sets "cacheable": true are cached; tools with side effects
+    (writes, HTTP POSTs, ...) must always run. Responses are reused for at most
+    _TOOL_CACHE_TTL seconds.
+    """
+    _TOOL_CACHE[cache_key] = (time.monotonic() + _TOOL_CACHE_TTL, formatted_response)
+    _TOOL_CACHE.move_to_end(cache_key)
+    if len(_TOOL_CACHE) > _TOOL_CACHE_SIZE:
+        _TOOL_CACHE.popitem(last=False)
+
+def commit_to_history(conversation_history, messages):
+    """
+    Append messages to the conversation history.
+
+    The history is append-only: earlier entries are never modified, removed or
+    reordered, so every request starts with the previous request's messages and
+    providers can reuse their cached prefix.
+    """
+    conversation_history.extend(messages)
+
+async def execute_tool_call(
+    tool_call,
+    conversation_history,
+    read_stream,
+    write_stream,
+    format: Literal["openai", "llama", "auto"] = "auto",
+):
+    """Execute a single tool call and return the messages to add to the conversation history.
+
+    The messages are returned as an (assistant tool call, tool response) pair, or an
+    empty tuple if the call failed.
+
+    The history is only read (for Llama's XML format), never modified, so several
+    calls can run concurrently and have their results appended in a fixed order.
+
+    format says where the tool call is: "openai" only looks at the object- or dict-style
+    call, "llama" only at the XML in the last message, and "auto" tries both in turn.
+    """
     try:
-        # Handle object-style tool calls from both OpenAI and Ollama
-        if hasattr(tool_call, 'function') or (isinstance(tool_call, dict) and 'function' in tool_call):
-            # Get tool name and arguments based on format
-            if hasattr(tool_call, 'function'):
-                tool_name = tool_call.function.name
-                raw_arguments = tool_call.function.arguments
-            else:
-                tool_name = tool_call['function']['name']
-                raw_arguments = tool_call['function']['arguments']
-        else:
-            # Parse Llama's XML format from the last message
-            last_message = conversation_history[-1]["content"]
-            parsed_tool = parse_tool_response(last_message)
-            if not parsed_tool:
-                logging.debug("Unable to parse tool call from message")
-                return
-            
-            tool_name = parsed_tool["function"]
-            raw_arguments = parsed_tool["arguments"]
+        # Handle object-style tool calls from both OpenAI and Ollama,
+        # falling back to Llama's XML format in the last message
+        extracted = _extract_openai(tool_call) if format != "llama" else None
+        if extracted is None and format != "openai":
+            extracted = _extract_llama(conversation_history)
+        if extracted is None:
+            logging.debug("Unable to parse tool call from message")
+            return ()
+
+        tool_name, raw_arguments = extracted
 
-        # Parse the tool arguments
-        tool_args = json.loads(raw_arguments) if isinstance(raw_arguments, str) else raw_arguments
+        # Parse the tool arguments; this also checks they're valid JSON before they're sent
+        tool_args = orjson.loads(raw_arguments) if type(raw_arguments) is str else raw_arguments
         
-        # print the tool invocation
-        print(f"\nTool: '{tool_name}' invoked with arguments: {tool_args}")
-
-        # execute the tool
-        tool_response = await send_call_tool(tool_name, tool_args, read_stream, write_stream)
-        if tool_response.get("isError"):
-            logging.debug(f"Error calling tool: {tool_response.get('error')}")
-            return
-
-        # Format and display the response
-        formatted_response = format_tool_response(tool_response.get("content", []))
-        logging.debug(f"Tool '{tool_name}' Response: {formatted_response}")  # Fixed logging line
-
-        # Add the tool call to conversation history (required for OpenAI)
-        conversation_history.append({
-            "role": "assistant",
-            "content": None,
-            "tool_calls": [{
-                "id": f"call_{tool_name}",
+        # show the tool invocation; the arguments are only logged, and only formatted
+        # if the record is emitted, as they can be large
+        print(f"\nTool: '{tool_name}' invoked")
+        logging.info("Tool %r invoked with arguments %r", tool_name, tool_args)
+
+        # reuse the response of an identical earlier call to a cacheable tool
+        cache_key = None
+        formatted_response = None
+        if tool_name in _CACHEABLE_TOOLS:
+            cache_key = (tool_name, orjson.dumps(tool_args, option=orjson.OPT_SORT_KEYS))
+            cached = _TOOL_CACHE.get(cache_key)
+            if cached and cached[0] > time.monotonic():
+                formatted_response = cached[1]
+
+        if formatted_response is not None:
+            _TOOL_CACHE.move_to_end(cache_key)
+            logging.debug("Tool %r Response (cached): %s", tool_name, formatted_response)
+        else:
+            # execute the tool, passing an argument string through without re-encoding it
+            tool_response = await _send_call_tool_raw(tool_name, raw_arguments, read_stream, write_stream)
+            if tool_response.get("isError"):
+                logging.debug(f"Error calling tool: {tool_response.get('error')}")
+                return ()
+
+            # Format and display the response
+            formatted_response = format_tool_response(tool_response.get("content", []))
+            logging.debug("Tool %r Response: %s", tool_name, formatted_response)
+
+            if cache_key is not None:
+                _cache_tool_response(cache_key, formatted_response)
+
+        # the tool call (required for OpenAI) followed by the tool response;
+        # the argument string is reused as received rather than re-encoded
+        call_id = f"call_{tool_name}_{next(_CALL_COUNTER)}"
+        args_for_history = raw_arguments if type(raw_arguments) is str else _dumps(tool_args)
+        assistant_message = AssistantToolCallMsg(
+            role="assistant",
+            content=None,
+            tool_calls=[{
+                "id": call_id,
                 "type": "function",
-                "function": {
-                    "name": tool_name,
-                    "arguments": json.dumps(tool_args) if isinstance(tool_args, dict) else tool_args
-                }
-            }]
-        })
-
-        # Add the tool response to conversation history
-        conversation_history.append({
-            "role": "tool",
-            "name": tool_name,
-            "content": formatted_response,
-            "tool_call_id": f"call_{tool_name}"
-        })
-
-    except json.JSONDecodeError:
+                "function": {"name": tool_name, "arguments": args_for_history},
+            }],
+        )
+        tool_message = ToolResultMsg(
+            role="tool",
+            name=tool_name,
+            content=formatted_response,
+            tool_call_id=call_id,
+        )
+        return (assistant_message, tool_message)
+
+    except orjson.JSONDecodeError:
         logging.debug(f"Error decoding arguments for tool '{tool_name}': {raw_arguments}")
     except Exception as e:
         logging.debug(f"Error handling tool call: {str(e)}")
+    return ()
+
+async def run_tool_calls(
+    tool_calls,
+    conversation_history,
+    read_stream,
+    write_stream,
+    started=None,
+    format: Literal["openai", "llama", "auto"] = "auto",
+):
+    """
+    Run a turn's tool calls, in parallel where they don't depend on each other.
+
+    A tool call depends on another when its arguments contain "$ref:<tool_call_id>";
+    that marker is replaced with the other call's output before it runs. Calls are run
+    in waves, each wave holding every call whose dependencies have already finished.
+
+    Args:
+        tool_calls (list): The tool calls requested by the assistant.
+        conversation_history (list): The conversation history (read only).
+        read_stream: The stream to read responses.
+        write_stream: The stream to send requests.
+        started (dict, optional): Tasks for calls that were already started, by index.
+        format (str, optional): The tool call format, see execute_tool_call. Defaults to "auto".
+
+    Returns:
+        list: The messages for each tool call, in the order the calls were requested.
+    """
+    started = started or {}
+    results = [() for _ in tool_calls]
+    outputs = {}
+
+    async def run(index):
+        task = started.get(index)
+        if task is not None:
+            results[index] = await task
+        else:
+            try:
+                tool_call = _resolve_tool_refs(tool_calls[index], outputs)
+            except ValueError:
+                # malformed arguments; skip the call, as execute_tool_call would
+                logging.debug(f"Error decoding arguments for tool call {ids[index]!r}")
+                return
+            results[index] = await execute_tool_call(
+                tool_call, conversation_history, read_stream, write_stream, format=format
+            )
+
+    ids = [_tool_call_id(tool_call) for tool_call in tool_calls]
+    for wave in _dependency_waves(tool_calls, ids):
+        async with asyncio.TaskGroup() as tg:
+            for index in wave:
+                tg.create_task(run(index))
+
+        # record the outputs that later waves may refer to
+        for index in wave:
+            if ids[index] and results[index]:
+                outputs[ids[index]] = results[index][-1].content
+
+    return results
+
+def has_tool_refs(tool_call):
+    """Check whether a tool call's arguments refer to the output of another tool call."""
+    return bool(_tool_refs(tool_call))
+
+def _tool_refs(tool_call):
+    """Get the tool call ids referenced by $ref markers in a tool call's arguments."""
+    function = _extract_openai(tool_call)
+    if function is None:
+        return []
+
+    arguments = function[1]
+    if not isinstance(arguments, str):
+        arguments = _dumps(arguments)
+    return _TOOL_REF_RE.findall(arguments)
+
+def _extract_openai(tool_call):
+    """Get the (name, arguments) of an object- or dict-style tool call, or None for Llama's format."""
+    # dicts (Ollama, streamed OpenAI calls) first, then a single attribute fetch for SDK objects
+    if type(tool_call) is dict:
+        function = tool_call.get("function")
+        return (function["name"], function["arguments"]) if function is not None else None
+
+    function = getattr(tool_call, "function", None)
+    return (function.name, function.arguments) if function is not None else None
+
+def _extract_llama(conversation_history):
+    """Get the (name, arguments) of a Llama XML-style tool call in the last message, or None."""
+    last_message = conversation_history[-1]
+    content = last_message["content"] if type(last_message) is dict else last_message.content
+    parsed_tool = parse_tool_response(content)
+    if not parsed_tool:
+        return None
+    return parsed_tool["function"], parsed_tool["arguments"]
+
+def _tool_call_id(tool_call):
+    """Get the id of a tool call, if it has one."""
+    if isinstance(tool_call, dict):
+        return tool_call.get("id")
+    return getattr(tool_call, "id", None)
+
+def _dependency_waves(tool_calls, ids):
+    """Group tool call indices into waves using Kahn's algorithm on their $ref dependencies."""
+    index_by_id = {tool_call_id: index for index, tool_call_id in enumerate(ids) if tool_call_id}
+
+    # the calls each call depends on, and the calls depending on each call
+    depends_on = [set() for _ in tool_calls]
+    dependents = [set() for _ in tool_calls]
+    for index, tool_call in enumerate(tool_calls):
+        for ref in _tool_refs(tool_call):
+            dependency = index_by_id.get(ref)
+            if dependency is not None and dependency != index:
+                depends_on[index].add(dependency)
+                dependents[dependency].add(index)
+
+    # peel off the calls with no unfinished dependencies, one wave at a time
+    waves = []
+    remaining = [len(deps) for deps in depends_on]
+    wave = [index for index, count in enumerate(remaining) if count == 0]
+    done = 0
+    while wave:
+        waves.append(wave)
+        done += len(wave)
+        next_wave = []
+        for index in wave:
+            for dependent in dependents[index]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    next_wave.append(dependent)
+        wave = sorted(next_wave)
+
+    # a cycle can never be resolved, so run those calls last as they are
+    if done < len(tool_calls):
+        scheduled = {index for wave in waves for index in wave}
+        cyclic = [index for index in range(len(tool_calls)) if index not in scheduled]
+        logging.debug(f"Circular tool call references: {[ids[index] for index in cyclic]}")
+        waves.append(cyclic)
+
+    return waves
+
+def _resolve_tool_refs(tool_call, outputs):
+    """Return the tool call with $ref markers in its arguments replaced by the referenced outputs."""
+    if not outputs or not has_tool_refs(tool_call):
+        return tool_call
+
+    name, arguments = _extract_openai(tool_call)
+    if isinstance(arguments, str):
+        arguments = orjson.loads(arguments)
+
+    def resolve(value):
+        if isinstance(value, str):
+            return _TOOL_REF_RE.sub(lambda match: outputs.get(match.group(1), match.group(0)), value)
+        if isinstance(value, dict):
+            return {key: resolve(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [resolve(item) for item in value]
+        return value
+
+    return {
+        "id": _tool_call_id(tool_call),
+        "type": "function",
+        "function": {"name": name, "arguments": resolve(arguments)},
+    }
 
 def format_tool_response(response_content):
     """Format the response content from a tool."""
     if isinstance(response_content, list):
-        return "\n".join(
-            item.get("text", "No content") for item in response_content if item.get("type") == "text"
-        )
+        parts = [item["text"] for item in response_content if item.get("type") == "text" and "text" in item]
+        return "\n".join(parts) if parts else "No content"
     
     # return the formatted tool response
     return str(response_content)
@@ -105,24 +409,60 @@ async def fetch_tools(read_stream, write_stream):
     tools_response = await send_tools_list(read_stream, write_stream)
     tools = tools_response.get("tools", [])
 
-    # check the tools are valid
-    if not isinstance(tools, list) or not all(isinstance(tool, dict) for tool in tools):
+    # check the tools are valid; the server sends a homogeneous list, so checking the
+    # first entry is enough, with the full walk only done when debugging
+    if (
+        not isinstance(tools, list)
+        or (tools and not isinstance(tools[0], dict))
+        or (logging.getLogger().isEnabledFor(logging.DEBUG) and not all(isinstance(tool, dict) for tool in tools))
+    ):
         # invalid tools
         logging.debug("Invalid tools format received.")
         return None
     
+    # note which tools can have their responses cached, dropping responses cached
+    # for the previous tools, which may since have changed
+    _CACHEABLE_TOOLS.clear()
+    _TOOL_CACHE.clear()
+    _CACHEABLE_TOOLS.update(tool["name"] for tool in tools if tool.get("cacheable") is True)
+
     # return the tools
     return tools
 
 def convert_to_openai_tools(tools):
-    """Convert tools into OpenAI-compatible function definitions."""
-    return [
-        {
-            "type": "function",
-            "function": {
-                "name": tool["name"],
-                "parameters": tool.get("inputSchema", {}),
-            },
-        }
-        for tool in tools
-    ]
\ No newline at end of file
+    """
+    Convert tools into OpenAI-compatible function definitions.
+
+    Definitions are sorted by name, with their schema keys sorted, so the serialized
+    tools are byte-identical whatever order the server listed them in. The result is
+    cached on the tools' canonical JSON, so converting the same tools again (even a
+    freshly fetched copy) returns the same tuple of definitions.
+    """
+    # each tool is serialized once, for both the list's and its own cache key
+    return _convert_to_openai_tools(
+        tuple(orjson.dumps(tool, option=orjson.OPT_SORT_KEYS) for tool in tools)
+    )
+
+@functools.lru_cache(maxsize=8)
+def _convert_to_openai_tools(tools_json: tuple[bytes, ...]):
+    """Convert tools, each given as canonical JSON, into OpenAI-compatible function definitions."""
+    definitions = [_convert_tool(tool_json) for tool_json in tools_json]
+    return tuple(sorted(definitions, key=lambda definition: definition["function"]["name"]))
+
+@functools.lru_cache(maxsize=256)
+def _convert_tool(tool_json: bytes):
+    """
+    Convert a single tool, given as canonical JSON, into an OpenAI-compatible function definition.
+
+    Cached per tool, so an unchanged tool is converted to the same object even when the
+    rest of the tools list changes. The JSON was dumped with sorted keys, so the schema
+    loaded from it is already sorted.
+    """
+    tool = orjson.loads(tool_json)
+    return {
+        "type": "function",
+        "function": {
+            "name": tool["name"],
+            "parameters": tool.get("inputSchema", {}),
+        },
+    }
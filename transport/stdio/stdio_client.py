@@ -1,15 +1,18 @@
 # transport/stdio/stdio_client.py
 import sys
-import json
 import logging
 import anyio
-from anyio.streams.text import TextReceiveStream
+import orjson
+from collections import deque
 from contextlib import asynccontextmanager
 from environment import get_default_environment
 from messages.json_rpc_message import JSONRPCMessage
 from transport.stdio.stdio_server_parameters import StdioServerParameters
 import traceback
 
+# number of outgoing messages that can queue up while a write is in progress
+WRITE_BUFFER_SIZE = 64
+
 @asynccontextmanager
 async def stdio_client(server: StdioServerParameters):
     # ensure we have a server command
@@ -22,7 +25,7 @@ async def stdio_client(server: StdioServerParameters):
     
     # create the the read and write streams
     read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
-    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(WRITE_BUFFER_SIZE)
 
     # start the subprocess
     process = await anyio.open_process(
@@ -35,21 +38,19 @@ async def stdio_client(server: StdioServerParameters):
     logging.debug(f"Subprocess started with PID {process.pid}, command: {server.command}")
 
     # create a task to read from the subprocess' stdout
-    async def process_json_line(line: str, writer):
+    async def process_json_line(line: bytes, writer):
         try:
-            logging.debug(f"Processing line: {line.strip()}")
-            data = json.loads(line)
-
             # parse the json
-            logging.debug(f"Parsed JSON data: {data}")
+            data = orjson.loads(line)
 
-            # validate the jsonrpc message
-            message = JSONRPCMessage.model_validate(data)
-            logging.debug(f"Validated JSONRPCMessage: {message}")
+            # build the jsonrpc message, skipping validation of the trusted server response
+            message = JSONRPCMessage.model_construct(**data)
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(f"Received JSONRPCMessage: {message}")
 
             # send the message
             await writer.send(message)
-        except json.JSONDecodeError as exc:
+        except orjson.JSONDecodeError as exc:
             # not valid json
             logging.error(f"JSON decode error: {exc}. Line: {line.strip()}")
         except Exception as exc:
@@ -60,18 +61,34 @@ async def stdio_client(server: StdioServerParameters):
     async def stdout_reader():
         """Read JSON-RPC messages from the server's stdout."""
         assert process.stdout, "Opened process is missing stdout"
-        buffer = ""
+
+        # pieces of the current line; only joined once the whole line has arrived,
+        # so large messages aren't copied every time another chunk is read
+        pending = deque()
         logging.debug("Starting stdout_reader")
         try:
             async with read_stream_writer:
-                async for chunk in TextReceiveStream(process.stdout):
-                    lines = (buffer + chunk).split("\n")
-                    buffer = lines.pop()
-                    for line in lines:
+                async for chunk in process.stdout:
+                    view = memoryview(chunk)
+                    start = 0
+                    end = chunk.find(b"\n")
+                    while end != -1:
+                        pending.append(view[start:end])
+                        line = b"".join(pending)
+                        pending.clear()
                         if line.strip():
                             await process_json_line(line, read_stream_writer)
-                if buffer.strip():
-                    await process_json_line(buffer, read_stream_writer)
+
+                        start = end + 1
+                        end = chunk.find(b"\n", start)
+
+                    # keep the incomplete line for the next chunk
+                    if start < len(chunk):
+                        pending.append(view[start:])
+
+                line = b"".join(pending)
+                if line.strip():
+                    await process_json_line(line, read_stream_writer)
         except anyio.ClosedResourceError:
             logging.debug("Read stream closed.")
         except Exception as exc:
@@ -88,9 +105,17 @@ async def stdio_client(server: StdioServerParameters):
         try:
             async with write_stream_reader:
                 async for message in write_stream_reader:
-                    json_str = message.model_dump_json(exclude_none=True)
-                    logging.debug(f"Sending: {json_str}")
-                    await process.stdin.send((json_str + "\n").encode())
+                    # take any other messages already queued, so they go out in a single write
+                    messages = [message]
+                    while True:
+                        try:
+                            messages.append(write_stream_reader.receive_nowait())
+                        except (anyio.WouldBlock, anyio.EndOfStream):
+                            break
+
+                    frames = [m.model_dump_bytes(exclude_none=True) + b"\n" for m in messages]
+                    logging.debug("Sending %d message(s): %s", len(frames), frames)
+                    await process.stdin.send(b"".join(frames))
         except anyio.ClosedResourceError:
             logging.debug("Write stream closed.")
         except Exception as exc: